@@ -1,40 +1,198 @@
 from __future__ import annotations
 
-import json
+import functools
+import io
 import logging
+import multiprocessing
 import os
 import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import azure.durable_functions as df
 import azure.functions as func
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError
 from azure.data.tables import TableServiceClient
-from azure.storage.blob import BlobServiceClient
-from pypdf import PdfReader
+from azure.storage.blob import BlobServiceClient, ContentSettings
+import fitz  # PyMuPDF
+import orjson
+
+from pdf_extraction import extract_page_range, page_text_and_word_count
+
+try:
+    # RE2 compiles to an automaton: linear-time scanning, no catastrophic backtracking.
+    # It rejects backreferences/lookarounds, none of which are used by the patterns below.
+    import re2
+
+    _compile_sensitive = re2.compile
+except ImportError:  # google-re2 wheel not available (e.g. some local dev setups)
+    # RE2's (and Hyperscan's) \s, \d and \b are ASCII-only while `re` is Unicode-aware on str;
+    # re.ASCII keeps the fallback reporting the same matches as production
+    _compile_sensitive = functools.partial(re.compile, flags=re.ASCII)
+
+try:
+    # Hyperscan matches all patterns in one SIMD-accelerated pass (x86-64 only)
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 app = func.FunctionApp()
 
+
+def _count_words(text: str) -> int:
+    """
+    Whitespace-separated tokens: the same definition as the word count extract_all takes
+    from MuPDF's get_text("words"), so every path reports comparable numbers.
+    """
+    return len(text.split())
+
+
+# Sensitive-data patterns, keyed by the detect_sensitive_data output field. Phone and date
+# formats are specialized per locale so non-US documents are not scanned with NANP-only
+# patterns. Dates come before phones: in the fused regex, the first alternative wins.
+_EMAIL_PATTERN = r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"
+_URL_PATTERN = r"\bhttps?://[^\s)]+|\bwww\.[^\s)]+"
+
+_SENSITIVE_PATTERNS_BY_LOCALE = {
+    "US": {
+        "emails": _EMAIL_PATTERN,
+        "urls": _URL_PATTERN,
+        "dates": r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4})\b",
+        "phones": r"\b(?:\+?1[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)\d{3}[-.\s]?\d{4}\b",
+    },
+    "INTL": {
+        "emails": _EMAIL_PATTERN,
+        "urls": _URL_PATTERN,
+        "dates": r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}[./]\d{1,2}[./]\d{2,4})\b",
+        # A "+CC" prefix (optionally followed by "(0)") or a leading trunk 0, e.g. "+49 30 1234 5678",
+        # "+44 (0)20 7946 0958", "+33 1 23 45 67 89", "(030) 1234567", "01 23 45 67 89"; so years,
+        # counts, version numbers and dates ("2021 2022", "10.0.19041", "2024.03.15") are not
+        # phone-shaped. Only the first group after the prefix may be a single digit.
+        "phones": r"(?:\+\d{1,3}(?:[-.\s]?\(0\))?|\(0\d{1,4}\)|\b0\d{1,4})[-.\s]?\d{1,8}(?:[-.\s]?\d{2,8}){0,4}\b",
+    },
+}
+# E.164 numbers have at most 15 digits; national numbers with trunk prefix at least 8
+_PHONE_MIN_DIGITS = 8
+_PHONE_MAX_DIGITS = 15
+# The patterns' character classes are ASCII on every engine, so non-ASCII spaces (e.g. the
+# no-break spaces common in PDFs) are mapped to " " before scanning and still end a match
+_NON_ASCII_SPACES = {i: " " for i in range(0x80, 0x3001) if chr(i).isspace()}
+_DEFAULT_LOCALE = "US"
+_SENSITIVE_FIELDS = list(_SENSITIVE_PATTERNS_BY_LOCALE[_DEFAULT_LOCALE])
+
+# One alternation with a named group per field: the text is scanned once instead of 4 times
+_SENSITIVE_RES = {
+    locale: _compile_sensitive("|".join(f"(?P<{name}>{pattern})" for name, pattern in patterns.items()))
+    for locale, patterns in _SENSITIVE_PATTERNS_BY_LOCALE.items()
+}
+
+
+def _compile_hyperscan_db(patterns: Dict[str, str]):
+    """
+    Same patterns compiled into a single Hyperscan database (pattern id = index in
+    _SENSITIVE_FIELDS). Returns None when Hyperscan is unavailable; the regex is used then.
+    """
+    if hyperscan is None:
+        return None
+
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[patterns[name].encode() for name in _SENSITIVE_FIELDS],
+            ids=list(range(len(_SENSITIVE_FIELDS))),
+            elements=len(_SENSITIVE_FIELDS),
+            # UTF8 keeps matches on code point boundaries; no UCP, so \s, \d and \b stay ASCII
+            # like on RE2 and the re.ASCII fallback
+            flags=[hyperscan.HS_FLAG_SOM_LEFTMOST | hyperscan.HS_FLAG_UTF8] * len(_SENSITIVE_FIELDS),
+        )
+    except hyperscan.error:
+        logging.warning("Hyperscan database compilation failed; using the regex scanner", exc_info=True)
+        return None
+    return db
+
+
+_HS_DBS = {locale: _compile_hyperscan_db(patterns) for locale, patterns in _SENSITIVE_PATTERNS_BY_LOCALE.items()}
+# Scratch space must not be shared by concurrent scans: one per thread (and database)
+_HS_SCRATCH = threading.local()
+
+
+def _hs_scratch(locale: str, hs_db):
+    scratches = getattr(_HS_SCRATCH, "by_locale", None)
+    if scratches is None:
+        scratches = _HS_SCRATCH.by_locale = {}
+    scratch = scratches.get(locale)
+    if scratch is None:
+        scratch = scratches[locale] = hyperscan.Scratch(hs_db)
+    return scratch
+
 # =============================================================================
-# Helpers
+# Configuration (read once at import: a missing setting fails at cold start)
 # =============================================================================
-def _get_storage_conn_str() -> str:
+@dataclass(frozen=True)
+class _Cfg:
+    storage_conn: str
+    table_conn: str
+    table_name: str
+    report_container: str
+    cache_container: str
+
+
+def _load_config() -> _Cfg:
     """
-    Uses AzureWebJobsStorage (Azurite locally: UseDevelopmentStorage=true).
+    Uses AzureWebJobsStorage (Azurite locally: UseDevelopmentStorage=true), also for
+    Table Storage unless TableStorageConnection is set.
     """
-    conn = os.getenv("AzureWebJobsStorage")
-    if not conn:
+    storage_conn = os.environ.get("AzureWebJobsStorage")
+    if not storage_conn:
         raise RuntimeError("AzureWebJobsStorage is not set in environment/local.settings.json")
-    return conn
+
+    return _Cfg(
+        storage_conn=storage_conn,
+        table_conn=os.environ.get("TableStorageConnection") or storage_conn,
+        table_name=os.environ.get("ReportTableName", "PdfReports"),
+        report_container=os.environ.get("ReportContainerName", "reports"),
+        cache_container=os.environ.get("TextCacheContainerName", "cache"),
+    )
 
 
-def _download_pdf_bytes(container: str, blob_name: str) -> bytes:
+_CFG = _load_config()
+
+# =============================================================================
+# Helpers
+# =============================================================================
+@functools.lru_cache(maxsize=1)
+def _blob_service() -> BlobServiceClient:
     """
-    Download PDF bytes from Blob Storage (works with Azurite and Azure).
+    One BlobServiceClient per worker process, so activities reuse its HTTP connection pool.
     """
-    service = BlobServiceClient.from_connection_string(_get_storage_conn_str())
-    blob = service.get_blob_client(container=container, blob=blob_name)
-    return blob.download_blob().readall()
+    return BlobServiceClient.from_connection_string(_CFG.storage_conn)
+
+
+def _download_pdf(container: str, blob_name: str, etag: Optional[str] = None) -> bytes:
+    """
+    Download a PDF from Blob Storage into memory (works with Azurite and Azure).
+    When `etag` is given, the download fails if the blob has changed since that ETag was read.
+    """
+    blob = _blob_service().get_blob_client(container=container, blob=blob_name)
+    conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+    # Parallel range GETs; no client-side content hashing (HTTPS already protects the transfer)
+    downloader = blob.download_blob(max_concurrency=8, validate_content=False, **conditions)
+
+    buf = io.BytesIO()
+    if downloader.size:
+        # Size the buffer once up front so the parallel chunk writes never grow/copy it
+        buf.seek(downloader.size - 1)
+        buf.write(b"\0")
+        buf.seek(0)
+    downloader.readinto(buf)
+    # The buffer is exactly full, so getvalue() hands over its bytes without copying them
+    return buf.getvalue()
 
 
 def _safe_str(v: Any) -> str:
@@ -43,45 +201,258 @@ def _safe_str(v: Any) -> str:
     return str(v)
 
 
-class _BytesIO:
-    def __init__(self, b: bytes):
-        import io
+@functools.lru_cache(maxsize=1)
+def _table_service() -> TableServiceClient:
+    return TableServiceClient.from_connection_string(_CFG.table_conn)
 
-        self._bio = io.BytesIO(b)
 
-    def __getattr__(self, item):
-        return getattr(self._bio, item)
+@functools.lru_cache(maxsize=None)
+def _table_client(table_name: str):
+    """
+    Cached per table name: create_table() is only attempted the first time. Any error other
+    than "already exists" propagates, so a failed create is retried on the next call.
+    """
+    table = _table_service().get_table_client(table_name)
+
+    try:
+        table.create_table()
+    except ResourceExistsError:
+        pass
+
+    return table
 
 
 def _get_table_client():
     """
     Azurite-friendly Table client.
     """
-    conn_str = os.environ.get("TableStorageConnection") or os.environ["AzureWebJobsStorage"]
-    table_name = os.environ.get("ReportTableName", "PdfReports")
+    return _table_client(_CFG.table_name)
 
-    service = TableServiceClient.from_connection_string(conn_str)
-    table = service.get_table_client(table_name)
+
+@functools.lru_cache(maxsize=None)
+def _blob_container(container_name: str):
+    """
+    Cached per container name: create_container() is only attempted the first time. Any error
+    other than "already exists" propagates, so a failed create is retried on the next call.
+    """
+    client = _blob_service().get_container_client(container_name)
 
     try:
-        table.create_table()
-    except Exception:
+        client.create_container()
+    except ResourceExistsError:
         pass
 
-    return table
+    return client
 
 
-def _query_entities_compat(table, filter_str: str):
+# Bump when the cached text or manifest format changes, so older entries are never served
+_TEXT_CACHE_VERSION = "v2"
+
+
+def _get_cache_blob_client(name: str):
+    """
+    Extracted text is cached in Blob Storage (keyed by the source PDF's ETag) so that
+    orchestrator/activity messages only carry blob names, not the text itself.
     """
-    azure-data-tables has had slightly different signatures across versions.
-    Support both:
-      - query_entities(query_filter="...")
-      - query_entities("...")
+    return _blob_container(_CFG.cache_container).get_blob_client(name)
+
+
+def _read_cache_blob(name: str) -> bytes:
+    return _get_cache_blob_client(name).download_blob().readall()
+
+
+def _write_cache_blob(name: str, data: bytes, content_type: str) -> None:
+    _get_cache_blob_client(name).upload_blob(
+        data,
+        overwrite=True,
+        content_settings=ContentSettings(content_type=content_type),
+    )
+
+
+def _get_report_blob_client(container: str, blob_name: str):
+    """
+    Full reports live in Blob Storage as reports/{container}/{blob_name}.json.
+    """
+    reports = _blob_container(_CFG.report_container)
+    return reports.get_blob_client(f"{container}/{blob_name}.json")
+
+
+def _open_pdf(pdf_bytes: bytes) -> fitz.Document:
     """
+    Open an in-memory PDF with PyMuPDF (C-backed MuPDF, much faster than pure-Python parsers).
+    Takes bytes rather than a BytesIO, which PyMuPDF would copy via getvalue().
+    """
+    return fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+# PyMuPDF is not thread-safe, so large documents are split across processes instead of threads
+_PARALLEL_EXTRACT_MIN_PAGES = 64
+_EXTRACT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+@functools.lru_cache(maxsize=1)
+def _extract_pool() -> ProcessPoolExecutor:
+    """
+    Long-lived pool (spawned once per worker process). "spawn" avoids forking the
+    multi-threaded Functions worker.
+    """
+    return ProcessPoolExecutor(max_workers=_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _extract_pages(doc: fitz.Document, pdf_bytes: bytes) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Returns (pages, word_count).
+    """
+    page_count = len(doc)
+    results = None
+    if _EXTRACT_WORKERS >= 2 and page_count >= _PARALLEL_EXTRACT_MIN_PAGES:
+        try:
+            results = _extract_pages_parallel(pdf_bytes, page_count)
+        except BrokenProcessPool:
+            # A child died (e.g. OOM-killed): drop the cached pool so the next call spawns a fresh one
+            logging.warning("Extraction pool broke; extracting %s pages sequentially", page_count)
+            _extract_pool.cache_clear()
+    if results is None:
+        results = [page_text_and_word_count(page) for page in doc]
+
+    pages = [{"page": i, "text": text} for i, (text, _) in enumerate(results, start=1)]
+    return pages, sum(count for _, count in results)
+
+
+def _extract_pages_parallel(pdf_bytes: bytes, page_count: int) -> List[Tuple[str, int]]:
+    """
+    Contiguous page ranges, one per worker. The PDF is written to a temp file once and each
+    worker opens it by path, rather than pickling the whole document into every task.
+    """
+    step = -(-page_count // _EXTRACT_WORKERS)
+    starts = list(range(0, page_count, step))
+    stops = [min(start + step, page_count) for start in starts]
+
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
     try:
-        return table.query_entities(query_filter=filter_str)
-    except TypeError:
-        return table.query_entities(filter_str)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        chunks = _extract_pool().map(extract_page_range, [pdf_path] * len(starts), starts, stops)
+        return [result for chunk in chunks for result in chunk]
+    finally:
+        os.remove(pdf_path)
+
+
+def _pdf_language(doc: fitz.Document) -> str:
+    """
+    Document language from the catalog's /Lang entry (e.g. "en-US"), "" if not set.
+    """
+    catalog = doc.pdf_catalog()
+    if not catalog:
+        return ""
+    kind, value = doc.xref_get_key(catalog, "Lang")
+    return value.strip("()") if kind == "string" else ""
+
+
+def _extract_metadata(doc: fitz.Document) -> Dict[str, str]:
+    md = doc.metadata or {}
+    return {
+        "title": _safe_str(md.get("title")),
+        "author": _safe_str(md.get("author")),
+        "subject": _safe_str(md.get("subject")),
+        "creator": _safe_str(md.get("creator")),
+        "producer": _safe_str(md.get("producer")),
+        "creation_date": _safe_str(md.get("creationDate")),
+        "mod_date": _safe_str(md.get("modDate")),
+        "language": _pdf_language(doc),
+    }
+
+
+def _iter_page_texts(payload: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yields the text to scan: the cached text blob written by extract_all, or `full_text`
+    when passed inline. Otherwise downloads the PDF and yields it page by page (standalone
+    calls), so the pages are never joined into a second full-size string.
+    """
+    if "text_blob" in payload:
+        if payload["text_blob"]:
+            yield _read_cache_blob(payload["text_blob"]).decode("utf-8")
+        return
+
+    if "full_text" in payload:
+        yield payload.get("full_text") or ""
+        return
+
+    container = payload.get("container") or "pdfs"
+    blob_name = payload.get("blob_name")
+    if not blob_name:
+        return
+
+    with _open_pdf(_download_pdf(container, blob_name)) as doc:
+        for page in doc:
+            yield page.get_text("text") or ""
+
+
+# BCP 47 primary subtags that do not identify a language (undetermined, no linguistic
+# content, multiple, uncoded); "x-..." / "i-..." are caught by the 2-3 letter check
+_NON_LANGUAGE_TAGS = {"und", "zxx", "mul", "mis"}
+
+
+def _locale_for_language(language: Optional[str]) -> str:
+    """
+    Maps a PDF /Lang value (e.g. "en-US", "fr-FR") to a key of _SENSITIVE_PATTERNS_BY_LOCALE.
+    Untagged documents keep the US patterns, and so do tags that name no language: private
+    use ("x-none", written by Word), "und", "zxx", "mul" or malformed values. Other English
+    locales (en-GB, en-AU, ...) use the international patterns, which match their
+    "+CC"/trunk-0 numbers and day-first dates.
+    """
+    if not language:
+        return _DEFAULT_LOCALE
+
+    lang, _, region = language.strip().replace("_", "-").partition("-")
+    lang = lang.lower()
+    if not (2 <= len(lang) <= 3 and lang.isalpha()) or lang in _NON_LANGUAGE_TAGS:
+        return _DEFAULT_LOCALE
+    if lang == "en" and region.upper() in ("", "US", "CA"):
+        return "US"
+    return "INTL"
+
+
+def _add_match(buckets: Dict[str, set], field: str, value: str) -> None:
+    if field == "phones" and not _PHONE_MIN_DIGITS <= sum(c.isdigit() for c in value) <= _PHONE_MAX_DIGITS:
+        return
+    buckets[field].add(value)
+
+
+def _scan_sensitive(text: str, buckets: Dict[str, set], locale: str = _DEFAULT_LOCALE) -> None:
+    """
+    Adds every sensitive-data match in `text` to buckets[<field>].
+    """
+    if not text.isascii():
+        text = text.translate(_NON_ASCII_SPACES)
+
+    hs_db = _HS_DBS.get(locale)
+    if hs_db is None:
+        for m in _SENSITIVE_RES[locale].finditer(text):
+            _add_match(buckets, m.lastgroup, m.group())
+        return
+
+    # "replace": HS_FLAG_UTF8 requires valid UTF-8, even for a stray surrogate in the text
+    data = text.encode("utf-8", "replace")
+    # Hyperscan reports every match end of every pattern independently (e.g. each prefix of
+    # a URL, or a phone number inside a URL). Keep the longest end per (start, pattern), then
+    # resolve overlaps across all patterns the way the fused alternation does: leftmost start
+    # first, ties going to the earlier field, and nothing starting inside a previous match.
+    ends: Dict[Tuple[int, int], int] = {}
+
+    def on_match(pattern_id: int, start: int, end: int, flags: int, context: Any) -> None:
+        key = (start, pattern_id)
+        if end > ends.get(key, -1):
+            ends[key] = end
+
+    hs_db.scan(data, match_event_handler=on_match, scratch=_hs_scratch(locale, hs_db))
+
+    last_end = -1
+    for start, pattern_id in sorted(ends):
+        if start < last_end:
+            continue
+        last_end = ends[(start, pattern_id)]
+        _add_match(buckets, _SENSITIVE_FIELDS[pattern_id], data[start:last_end].decode("utf-8", "ignore"))
 
 
 # =============================================================================
@@ -107,10 +478,22 @@ async def PdfBlobTrigger(myblob: func.InputStream, client: df.DurableOrchestrati
 
 
 # =============================================================================
-# 2) Orchestrator: Fan-Out/Fan-In (4 in parallel) + Chaining (report -> store)
+# 2) Orchestrator: extract once, then Fan-Out/Fan-In + Chaining (report -> store)
 # =============================================================================
 @app.orchestration_trigger(context_name="context")
 def PdfOrchestrator(context: df.DurableOrchestrationContext):
+    """
+    Replays after every completed activity, re-reading its history each time; the fan-out
+    runs in a sub-orchestration to keep that history short. Extended sessions are not
+    enabled: they are only supported for .NET, and on other runtimes they can stop
+    orchestration and activity triggers from running.
+
+    The Python worker runs FUNCTIONS_WORKER_PROCESS_COUNT (2) x PYTHON_THREADPOOL_THREAD_COUNT
+    (4) invocations at once per host. host.json splits those 8 slots between orchestrators
+    (2) and activities (6), so the Durable limits never exceed what the worker can run. A
+    higher activity limit would only queue work inside the worker, and extract_all is
+    CPU-bound MuPDF work (with its own process pool), not blob I/O.
+    """
     payload = context.get_input() or {}
     container = payload.get("container") or "pdfs"
     blob_name = payload.get("blob_name")
@@ -119,15 +502,22 @@ def PdfOrchestrator(context: df.DurableOrchestrationContext):
 
     base = {"container": container, "blob_name": blob_name}
 
-    # Fan-out (4 independent analyses IN PARALLEL)
-    tasks = [
-        context.call_activity("extract_text", base),
-        context.call_activity("extract_metadata", base),
-        context.call_activity("analyze_statistics", base),
-        context.call_activity("detect_sensitive_data", base),
-    ]
+    # Download + parse the PDF exactly once (text + metadata in one activity).
+    # The text itself stays in the cache blob; only its blob names flow through the history.
+    extracted = yield context.call_activity("extract_all", base)
 
-    text_result, metadata_result, stats_result, sensitive_result = yield context.task_all(tasks)
+    # Fan-out/Fan-in runs in a sub-orchestration so its history stays out of this one
+    analysis = yield context.call_sub_orchestrator(
+        "PdfAnalyzeSubOrchestrator",
+        {
+            "text_blob": extracted.get("text_blob"),
+            "page_count": extracted.get("page_count", 0),
+            "word_count": extracted.get("word_count"),
+            "locale": _locale_for_language((extracted.get("metadata") or {}).get("language")),
+        },
+    )
+    stats_result = analysis.get("analyze_statistics") or {}
+    sensitive_result = analysis.get("detect_sensitive_data") or {}
 
     # Chaining: generate report then store it
     report = yield context.call_activity(
@@ -135,8 +525,13 @@ def PdfOrchestrator(context: df.DurableOrchestrationContext):
         {
             "container": container,
             "blob_name": blob_name,
-            "extract_text": text_result,
-            "extract_metadata": metadata_result,
+            # Reference to the cached text; store_report expands it into pages/full_text
+            "extract_text": {
+                "etag": extracted.get("etag"),
+                "text_blob": extracted.get("text_blob"),
+                "pages_blob": extracted.get("pages_blob"),
+            },
+            "extract_metadata": extracted.get("metadata", {}),
             "analyze_statistics": stats_result,
             "detect_sensitive_data": sensitive_result,
         },
@@ -147,81 +542,84 @@ def PdfOrchestrator(context: df.DurableOrchestrationContext):
 
 
 # =============================================================================
-# 3) Activity: extract_text
+# 2b) Sub-orchestrator: Fan-Out/Fan-In of the text-only analyses
 # =============================================================================
-@app.activity_trigger(input_name="payload")
-def extract_text(payload: Dict[str, Any]):
-    container = payload.get("container") or "pdfs"
-    blob_name = payload.get("blob_name")
-    if not blob_name:
-        return {"pages": [], "full_text": ""}
-
-    pdf_bytes = _download_pdf_bytes(container, blob_name)
-    reader = PdfReader(_BytesIO(pdf_bytes))
-
-    pages: List[Dict[str, Any]] = []
-    full_text_parts: List[str] = []
-
-    for i, page in enumerate(reader.pages, start=1):
-        text = page.extract_text() or ""
-        pages.append({"page": i, "text": text})
-        if text:
-            full_text_parts.append(text)
+@app.orchestration_trigger(context_name="context")
+def PdfAnalyzeSubOrchestrator(context: df.DurableOrchestrationContext):
+    payload = context.get_input() or {}
+    text_blob = payload.get("text_blob")
+    page_count = payload.get("page_count") or 0
+    stats_input = {"text_blob": text_blob, "page_count": page_count}
+    if payload.get("word_count") is not None:
+        # Already counted by extract_all: analyze_statistics won't need to read the text
+        stats_input["word_count"] = payload["word_count"]
+
+    # Fan-out (text-only analyses IN PARALLEL, reading the cached text instead of the PDF)
+    tasks = [
+        context.call_activity("analyze_statistics", stats_input),
+        context.call_activity("detect_sensitive_data", {"text_blob": text_blob, "locale": payload.get("locale")}),
+    ]
 
-    return {"pages": pages, "full_text": "\n".join(full_text_parts)}
+    stats_result, sensitive_result = yield context.task_all(tasks)
+    return {"analyze_statistics": stats_result, "detect_sensitive_data": sensitive_result}
 
 
 # =============================================================================
-# 4) Activity: extract_metadata
+# 3) Activity: extract_all (text + metadata from a single download/parse)
 # =============================================================================
 @app.activity_trigger(input_name="payload")
-def extract_metadata(payload: Dict[str, Any]):
+def extract_all(payload: Dict[str, Any]):
     container = payload.get("container") or "pdfs"
     blob_name = payload.get("blob_name")
     if not blob_name:
-        return {}
+        return {"etag": None, "page_count": 0, "word_count": 0, "text_blob": None, "pages_blob": None, "metadata": {}}
 
-    pdf_bytes = _download_pdf_bytes(container, blob_name)
-    reader = PdfReader(_BytesIO(pdf_bytes))
+    source = _blob_service().get_blob_client(container=container, blob=blob_name)
+    etag = source.get_blob_properties().etag
+    cache_key = "/".join([_TEXT_CACHE_VERSION, container, blob_name, etag.strip('"')])
+    manifest_blob = f"{cache_key}.json"
 
-    md = reader.metadata or {}
-    return {
-        "title": _safe_str(md.get("/Title")),
-        "author": _safe_str(md.get("/Author")),
-        "subject": _safe_str(md.get("/Subject")),
-        "creator": _safe_str(md.get("/Creator")),
-        "producer": _safe_str(md.get("/Producer")),
-        "creation_date": _safe_str(md.get("/CreationDate")),
-        "mod_date": _safe_str(md.get("/ModDate")),
+    # Same ETag => same bytes: reuse the previous extraction (e.g. re-runs of the orchestration)
+    if _get_cache_blob_client(manifest_blob).exists():
+        return orjson.loads(_read_cache_blob(manifest_blob))
+
+    pdf_bytes = _download_pdf(container, blob_name, etag)
+    with _open_pdf(pdf_bytes) as doc:
+        pages, word_count = _extract_pages(doc, pdf_bytes)
+        metadata = _extract_metadata(doc)
+
+    full_text = "\n".join(p["text"] for p in pages if p["text"])
+
+    result = {
+        "etag": etag,
+        "page_count": len(pages),
+        "word_count": word_count,
+        "text_blob": f"{cache_key}.txt",
+        "pages_blob": f"{cache_key}_pages.json",
+        "metadata": metadata,
     }
+    _write_cache_blob(result["text_blob"], full_text.encode("utf-8"), "text/plain; charset=utf-8")
+    _write_cache_blob(result["pages_blob"], orjson.dumps(pages), "application/json")
+    # Written last: its presence means the text and pages blobs are complete
+    _write_cache_blob(manifest_blob, orjson.dumps(result), "application/json")
+    return result
 
 
 # =============================================================================
-# 5) Activity: analyze_statistics  (NOW INDEPENDENT so it can run in parallel)
+# 4) Activity: analyze_statistics  (text-only, runs in parallel)
 # =============================================================================
 @app.activity_trigger(input_name="payload")
 def analyze_statistics(payload: Dict[str, Any]):
-    container = payload.get("container") or "pdfs"
-    blob_name = payload.get("blob_name")
-    if not blob_name:
-        return {
-            "page_count": 0,
-            "word_count": 0,
-            "avg_words_per_page": 0.0,
-            "estimated_reading_time_minutes": 0.0,
-        }
-
-    pdf_bytes = _download_pdf_bytes(container, blob_name)
-    reader = PdfReader(_BytesIO(pdf_bytes))
-
-    page_count = len(reader.pages)
-    all_text_parts: List[str] = []
-    for page in reader.pages:
-        all_text_parts.append(page.extract_text() or "")
-    full_text = "\n".join(all_text_parts)
-
-    words = re.findall(r"\b\w+\b", full_text)
-    word_count = len(words)
+    word_count = 0
+    pages_seen = 0
+    if payload.get("word_count") is not None:
+        word_count = int(payload["word_count"])
+    else:
+        for text in _iter_page_texts(payload):
+            word_count += _count_words(text)
+            pages_seen += 1
+
+    page_count = int(payload.get("page_count") or 0) if "page_count" in payload else pages_seen
     avg_words_per_page = (word_count / page_count) if page_count else 0.0
 
     wpm = 200
@@ -236,38 +634,28 @@ def analyze_statistics(payload: Dict[str, Any]):
 
 
 # =============================================================================
-# 6) Activity: detect_sensitive_data
+# 5) Activity: detect_sensitive_data  (text-only, runs in parallel)
 # =============================================================================
 @app.activity_trigger(input_name="payload")
 def detect_sensitive_data(payload: Dict[str, Any]):
-    container = payload.get("container") or "pdfs"
-    blob_name = payload.get("blob_name")
-    if not blob_name:
-        return {"emails": [], "phones": [], "urls": [], "dates": []}
+    locale = payload.get("locale")
+    if locale not in _SENSITIVE_PATTERNS_BY_LOCALE:
+        locale = _DEFAULT_LOCALE
 
-    pdf_bytes = _download_pdf_bytes(container, blob_name)
-    reader = PdfReader(_BytesIO(pdf_bytes))
-
-    full_text_parts: List[str] = []
-    for page in reader.pages:
-        full_text_parts.append(page.extract_text() or "")
-    text = "\n".join(full_text_parts)
-
-    email_re = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
-    url_re = re.compile(r"\bhttps?://[^\s)]+|\bwww\.[^\s)]+")
-    phone_re = re.compile(r"\b(?:\+?1[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)\d{3}[-.\s]?\d{4}\b")
-    date_re = re.compile(r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4})\b")
+    buckets: Dict[str, set] = {name: set() for name in _SENSITIVE_FIELDS}
+    for text in _iter_page_texts(payload):
+        _scan_sensitive(text, buckets, locale)
 
     return {
-        "emails": sorted(set(email_re.findall(text))),
-        "phones": sorted(set(phone_re.findall(text))),
-        "urls": sorted(set(url_re.findall(text))),
-        "dates": sorted(set(date_re.findall(text))),
+        "emails": sorted(buckets["emails"]),
+        "phones": sorted(buckets["phones"]),
+        "urls": sorted(buckets["urls"]),
+        "dates": sorted(buckets["dates"]),
     }
 
 
 # =============================================================================
-# 7) Activity: generate_report  (matches Lab 2 structure)
+# 6) Activity: generate_report  (matches Lab 2 structure)
 # =============================================================================
 @app.activity_trigger(input_name="payload")
 def generate_report(payload: Dict[str, Any]):
@@ -283,7 +671,7 @@ def generate_report(payload: Dict[str, Any]):
 
 
 # =============================================================================
-# 8) Activity: store_report (Table Storage)
+# 7) Activity: store_report (Blob Storage + Table Storage index)
 # =============================================================================
 @app.activity_trigger(input_name="payload")
 def store_report(payload: Dict[str, Any]):
@@ -292,6 +680,26 @@ def store_report(payload: Dict[str, Any]):
     if not blob_name:
         raise ValueError("store_report requires 'blob_name' in payload")
 
+    extract_text = payload.get("extract_text") or {}
+    if extract_text.get("pages_blob"):
+        # Expand the cache reference so the stored report holds the actual text
+        payload = {
+            **payload,
+            "extract_text": {
+                "pages": orjson.loads(_read_cache_blob(extract_text["pages_blob"])),
+                "full_text": _read_cache_blob(extract_text["text_blob"]).decode("utf-8"),
+            },
+        }
+
+    # The report (full text included) can exceed Table Storage's 64KB property / 1MB entity
+    # limits, so it goes to Blob Storage and the table row only points at it.
+    blob = _get_report_blob_client(container, blob_name)
+    blob.upload_blob(
+        orjson.dumps(payload),
+        overwrite=True,
+        content_settings=ContentSettings(content_type="application/json"),
+    )
+
     table = _get_table_client()
 
     entity = {
@@ -299,15 +707,17 @@ def store_report(payload: Dict[str, Any]):
         "RowKey": blob_name,
         "generated_at_utc": payload.get("generated_at_utc")
         or datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-        "report": json.dumps(payload, ensure_ascii=False),
+        # Blob name inside the report container (a bare URL would be unusable on a private container)
+        "report_blob": blob.blob_name,
     }
 
-    table.upsert_entity(mode="merge", entity=entity)
-    return {"partition_key": container, "row_key": blob_name, "table": table.table_name}
+    # Replace (not merge) so rows written before reports moved to Blob Storage lose their inline copy
+    table.upsert_entity(mode="replace", entity=entity)
+    return {"partition_key": container, "row_key": blob_name, "table": table.table_name, "report_blob": blob.blob_name}
 
 
 # =============================================================================
-# 9) HTTP Function: Get report OR list reports (Lab 2 style endpoint)
+# 8) HTTP Function: Get report OR list reports (Lab 2 style endpoint)
 #    GET /api/reports/{container}            -> list (optionally ?top=50)
 #    GET /api/reports/{container}/{blob_name} -> get one
 # =============================================================================
@@ -318,7 +728,7 @@ def reports(req: func.HttpRequest) -> func.HttpResponse:
 
     if not container:
         return func.HttpResponse(
-            json.dumps({"error": "Missing container in route."}),
+            orjson.dumps({"error": "Missing container in route."}),
             status_code=400,
             mimetype="application/json",
         )
@@ -329,10 +739,16 @@ def reports(req: func.HttpRequest) -> func.HttpResponse:
     if blob_name:
         try:
             entity = table.get_entity(partition_key=container, row_key=blob_name)
-            return func.HttpResponse(json.dumps(json.loads(entity.get("report", "{}")), indent=2), status_code=200, mimetype="application/json")
+            if "report" in entity and "report_blob" not in entity:
+                # Row stored before reports moved to Blob Storage
+                return func.HttpResponse(orjson.dumps(orjson.loads(entity["report"]), option=orjson.OPT_INDENT_2), status_code=200, mimetype="application/json")
+
+            reports_container = _blob_container(_CFG.report_container)
+            report = reports_container.get_blob_client(entity["report_blob"]).download_blob().readall()
+            return func.HttpResponse(report, status_code=200, mimetype="application/json")
         except Exception as e:
             return func.HttpResponse(
-                json.dumps({"error": "Report not found", "details": str(e)}),
+                orjson.dumps({"error": "Report not found", "details": str(e)}),
                 status_code=404,
                 mimetype="application/json",
             )
@@ -344,12 +760,16 @@ def reports(req: func.HttpRequest) -> func.HttpResponse:
         top = 50
     top = max(1, min(top, 200))
 
-    filter_str = f"PartitionKey eq '{container}'"
-
     items: List[Dict[str, Any]] = []
     try:
-        entities = _query_entities_compat(table, filter_str)
-        for e in entities:
+        # Parameterized filter (escaped by the SDK), only the listed columns, and one page of `top` rows
+        entities = table.query_entities(
+            query_filter="PartitionKey eq @pk",
+            parameters={"pk": container},
+            select=["PartitionKey", "RowKey", "generated_at_utc"],
+            results_per_page=top,
+        )
+        for e in next(entities.by_page(), []):
             items.append(
                 {
                     "container": e.get("PartitionKey"),
@@ -357,18 +777,16 @@ def reports(req: func.HttpRequest) -> func.HttpResponse:
                     "generated_at_utc": e.get("generated_at_utc"),
                 }
             )
-            if len(items) >= top:
-                break
     except Exception as ex:
         logging.exception("Failed to query reports from Table Storage")
         return func.HttpResponse(
-            json.dumps({"error": "Failed to query reports.", "details": str(ex)}),
+            orjson.dumps({"error": "Failed to query reports.", "details": str(ex)}),
             status_code=500,
             mimetype="application/json",
         )
 
     items.sort(key=lambda x: (x.get("generated_at_utc") or ""), reverse=True)
-    return func.HttpResponse(json.dumps({"count": len(items), "results": items}, indent=2, ensure_ascii=False), status_code=200, mimetype="application/json")
+    return func.HttpResponse(orjson.dumps({"count": len(items), "results": items}, option=orjson.OPT_INDENT_2), status_code=200, mimetype="application/json")
 
 @app.route(route="analyze", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
 @app.durable_client_input(client_name="client")
@@ -379,7 +797,7 @@ async def PdfHttpStarter(req: func.HttpRequest, client: df.DurableOrchestrationC
         body = req.get_json()
     except ValueError:
         return func.HttpResponse(
-            json.dumps({"error": "Invalid JSON body. Expected {container, blob_name}."}),
+            orjson.dumps({"error": "Invalid JSON body. Expected {container, blob_name}."}),
             status_code=400,
             mimetype="application/json",
         )
@@ -388,7 +806,7 @@ async def PdfHttpStarter(req: func.HttpRequest, client: df.DurableOrchestrationC
     blob_name = body.get("blob_name") or body.get("name")
     if not blob_name:
         return func.HttpResponse(
-            json.dumps({"error": "Missing 'blob_name' in request body."}),
+            orjson.dumps({"error": "Missing 'blob_name' in request body."}),
             status_code=400,
             mimetype="application/json",
         )
@@ -0,0 +1,35 @@
+"""
+Page-text extraction run inside the spawned extraction pool.
+
+Kept free of the Functions app (only PyMuPDF is imported) so each spawned child starts
+quickly and does not re-run function_app's configuration or pattern compilation.
+"""
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import fitz  # PyMuPDF
+
+
+def page_text_and_word_count(page: fitz.Page) -> Tuple[str, int]:
+    """
+    One get_text("words") pass gives both the page text (words re-joined per line) and its
+    word count, so no separate word-counting regex is needed.
+    """
+    words = page.get_text("words")
+    lines: List[List[str]] = []
+    current_line = None
+    for _x0, _y0, _x1, _y1, word, block_no, line_no, _word_no in words:
+        if (block_no, line_no) != current_line:
+            current_line = (block_no, line_no)
+            lines.append([])
+        lines[-1].append(word)
+    return "\n".join(" ".join(line) for line in lines), len(words)
+
+
+def extract_page_range(pdf_path: str, start: int, stop: int) -> List[Tuple[str, int]]:
+    """
+    Text and word count for pages [start, stop) of the PDF at `pdf_path`.
+    """
+    with fitz.open(pdf_path) as doc:
+        return [page_text_and_word_count(doc[i]) for i in range(start, stop)]
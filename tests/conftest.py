@@ -0,0 +1,6 @@
+import os
+import sys
+
+# function_app reads its settings at import time
+os.environ.setdefault("AzureWebJobsStorage", "UseDevelopmentStorage=true")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("hyperscan")
+
+import function_app as fa  # noqa: E402
+
+SAMPLES = [
+    "Call +49 30 1234 5678 or mail a.b@x.de, see https://x.org/a(b) on 2024-03-15.",
+    "www.example.com\xa0next 555-123-4567 and (555) 123-4567, 12/31/2024",
+    "Nr. 12 2024-03-15 +44 (0)20 7946 0958, 01 23 45 67 89 10.0.19041 2021 2022 2023",
+    "http://a.b/c?d=1 caf\xe9@ex.com www.\xfc.de/stra\xdfe 0301234567 https://y.z/\xe4",
+    # Matches overlapping across patterns: a phone inside a URL, a date inside a phone run
+    "+1 555 123 4567 http://x.y/+49 30 1234 5678 1/2/2024 (030) 1234567",
+]
+
+
+def _scan(text, locale):
+    buckets = {field: set() for field in fa._SENSITIVE_FIELDS}
+    fa._scan_sensitive(text, buckets, locale)
+    return buckets
+
+
+def _scan_regex(text, locale, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setitem(fa._HS_DBS, locale, None)
+        return _scan(text, locale)
+
+
+@pytest.mark.parametrize("locale", sorted(fa._SENSITIVE_PATTERNS_BY_LOCALE))
+def test_hyperscan_databases_compile(locale):
+    assert fa._HS_DBS[locale] is not None
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+@pytest.mark.parametrize("locale", sorted(fa._SENSITIVE_PATTERNS_BY_LOCALE))
+def test_hyperscan_matches_regex(text, locale, monkeypatch):
+    assert _scan(text, locale) == _scan_regex(text, locale, monkeypatch)
+
+
+def test_no_break_space_ends_url():
+    assert _scan("www.example.com\xa0next", "US")["urls"] == {"www.example.com"}
+
+
+def test_concurrent_scans():
+    expected = [_scan(text, "INTL") for text in SAMPLES]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(20):
+            assert list(pool.map(_scan, SAMPLES, ["INTL"] * len(SAMPLES))) == expected
@@ -0,0 +1,91 @@
+import pytest
+
+import function_app as fa
+
+
+def _scan(text, locale):
+    buckets = {field: set() for field in fa._SENSITIVE_FIELDS}
+    fa._scan_sensitive(text, buckets, locale)
+    return buckets
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "+49 30 1234 5678",
+        "+44 (0)20 7946 0958",
+        "+33 1 23 45 67 89",
+        "(030) 1234567",
+        "01 23 45 67 89",
+        "030-1234567",
+    ],
+)
+def test_intl_phone_numbers(text):
+    assert _scan(f"Tel. {text}.", "INTL")["phones"] == {text}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "2021 2022 2023",
+        "10 20 30",
+        "10.0.19041",
+        "2024.03.15",
+        "Page 12 of 345",
+        "ISBN 978 3 16 148410 0",
+    ],
+)
+def test_intl_non_phones(text):
+    assert _scan(text, "INTL")["phones"] == set()
+
+
+def test_intl_date_is_not_swallowed_by_phone():
+    found = _scan("Nr. 12 2024-03-15", "INTL")
+    assert found["dates"] == {"2024-03-15"}
+    assert found["phones"] == set()
+
+
+@pytest.mark.parametrize(
+    "value, kept",
+    [
+        ("+49 1234", False),  # 6 digits
+        ("030 12345", True),  # 8 digits
+        ("+49 30 1234 5678", True),
+        ("+49 123 4567 8901 23", True),  # 15 digits
+        ("+49 1234 5678 9012 3456", False),  # 18 digits
+    ],
+)
+def test_phone_digit_count_filter(value, kept):
+    buckets = {field: set() for field in fa._SENSITIVE_FIELDS}
+    fa._add_match(buckets, "phones", value)
+    assert (value in buckets["phones"]) is kept
+
+
+def test_digit_filter_applies_to_phones_only():
+    buckets = {field: set() for field in fa._SENSITIVE_FIELDS}
+    fa._add_match(buckets, "dates", "2024-03-15")
+    assert buckets["dates"] == {"2024-03-15"}
+
+
+@pytest.mark.parametrize(
+    "language, locale",
+    [
+        (None, "US"),
+        ("", "US"),
+        ("en", "US"),
+        ("en-US", "US"),
+        ("en_us", "US"),
+        ("en-CA", "US"),
+        ("en-GB", "INTL"),
+        ("en-AU", "INTL"),
+        ("de-DE", "INTL"),
+        ("fr", "INTL"),
+        ("x-none", "US"),
+        ("und", "US"),
+        ("zxx", "US"),
+        ("  ", "US"),
+        ("English", "US"),
+    ],
+)
+def test_locale_for_language(language, locale):
+    assert fa._locale_for_language(language) == locale